@@ -71,6 +71,8 @@ class Generator(object):
         self.image_shape = image_shape
         self.model_conf = mconf
         self.use_encoder = False  # Currently encoder is not supported.
+        # configs saved by older versions don't have channel_last.
+        self.channel_last = mconf.get("channel_last", False)
 
         self.inst_label = nn.Variable(shape=image_shape)
         self.id_label = nn.Variable(shape=image_shape)
@@ -80,11 +82,13 @@ class Generator(object):
     def define_network(self):
         id_onehot, bm = encode_inputs(self.inst_label, self.id_label,
                                       n_ids=self.model_conf.n_label_ids,
-                                      use_encoder=self.use_encoder)
+                                      use_encoder=self.use_encoder,
+                                      channel_last=self.channel_last)
 
-        x = F.concatenate(id_onehot, bm, axis=1)
+        x = F.concatenate(id_onehot, bm,
+                          axis=-1 if self.channel_last else 1)
 
-        generator = LocalGenerator()
+        generator = LocalGenerator(channel_last=self.channel_last)
         fake, _ = generator(x,
                             lg_channels=self.model_conf.lg_channels,
                             gg_channels=self.model_conf.gg_channels,
@@ -143,7 +147,7 @@ def generate():
         logger.warn("Path to load params is not found."
                     " Loading params is skipped and generated result will be unreasonable. ({})".format(conf.load_path))
 
-    nn.load_parameters(conf.load_path)
+    load_parameters_converting_layout(conf.load_path)
 
     progress_iterator = trange(len(data_list) // conf.train.batch_size,
                                desc="[Generating Images]", disable=comm.rank > 0)
@@ -169,7 +173,8 @@ def generate():
         input_image_path = os.path.join(
             save_path, "input_{}_{}.png".format(comm.rank, i))
 
-        imsave(gen_image_path, gen[0], channel_first=True)
+        imsave(gen_image_path, gen[0],
+               channel_first=not generator.channel_last)
         imsave(input_image_path, id_colorized)
         output_str.append(
             " ".join([x for x in paths + [gen_image_path, input_image_path]]))
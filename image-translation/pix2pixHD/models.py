@@ -46,10 +46,11 @@ class BaseGenerator(object):
     def __init__(self, padding_type="reflect", channel_last=False):
         self.padding_type = padding_type
         self.channel_last = channel_last
-        # currently deconv dose not support channel last.
-        self.conv_opts = dict(w_init=I.NormalInitializer(0.02))
+        self.conv_opts = dict(w_init=I.NormalInitializer(
+            0.02), channel_last=channel_last)
         # don't use adaptive parameter
-        self.norm_opts = dict(no_scale=True, no_bias=True)
+        self.norm_opts = dict(no_scale=True, no_bias=True,
+                              channel_axis=3 if channel_last else 1)
 
     def instance_norm_relu(self, x):
         # return F.relu(PF.layer_normalization(x, **self.norm_opts))
@@ -133,8 +134,9 @@ class Encoder(BaseGenerator):
 
 
 class GlobalGenerator(BaseGenerator):
-    def __init__(self, padding_type="reflect", n_outputs=3):
-        super(GlobalGenerator, self).__init__(padding_type=padding_type)
+    def __init__(self, padding_type="reflect", n_outputs=3, channel_last=False):
+        super(GlobalGenerator, self).__init__(padding_type=padding_type,
+                                              channel_last=channel_last)
         self.n_outputs = n_outputs
 
     @namescope_decorator("frontend")
@@ -180,8 +182,8 @@ class GlobalGenerator(BaseGenerator):
 
     def __call__(self, x, channels, downsample_input=True, n_residual_layers=9):
         if downsample_input:
-            x = F.average_pooling(
-                x, (3, 3), (2, 2), pad=(1, 1), including_pad=False)
+            x = F.average_pooling(x, (3, 3), (2, 2), pad=(1, 1),
+                                  including_pad=False, channel_last=self.channel_last)
 
         with nn.parameter_scope("generator/global"):
             h = self.front_end(x, channels)
@@ -192,8 +194,9 @@ class GlobalGenerator(BaseGenerator):
 
 
 class LocalGenerator(BaseGenerator):
-    def __init__(self, padding_type="reflect", n_outputs=3):
-        super(LocalGenerator, self).__init__(padding_type=padding_type)
+    def __init__(self, padding_type="reflect", n_outputs=3, channel_last=False):
+        super(LocalGenerator, self).__init__(padding_type=padding_type,
+                                             channel_last=channel_last)
         self.n_outputs = n_outputs
 
     @namescope_decorator("frontend")
@@ -244,11 +247,12 @@ class LocalGenerator(BaseGenerator):
         # create all scale inputs
         inputs = [x]
         for _ in range(n_scales - 1):
-            inputs.append(F.average_pooling(
-                inputs[-1], (3, 3), (2, 2), pad=(1, 1), including_pad=False))
+            inputs.append(F.average_pooling(inputs[-1], (3, 3), (2, 2), pad=(1, 1),
+                                            including_pad=False, channel_last=self.channel_last))
 
         # global generator (coarsest scale generator)
-        gg = GlobalGenerator(self.padding_type, self.n_outputs)
+        gg = GlobalGenerator(self.padding_type, self.n_outputs,
+                             channel_last=self.channel_last)
 
         _input = inputs.pop()  # get the coarsest scale input
         last_scale_out, last_scale_feat = gg(_input, gg_channels,
@@ -290,22 +294,33 @@ def encode_inputs(inst_label, id_label, n_ids, use_encoder=False, channel_last=F
     :param use_encoder: boolean
     :return:
     """
+    # inst -> boundary map
+    _check_intput(inst_label)
+    bm = inst_to_boundary(inst_label)
+
+    if use_encoder:
+        # todo: implement encoder network
+        pass
+
+    return encode_precomputed_inputs(bm, id_label, n_ids, channel_last=channel_last)
+
+
+def encode_precomputed_inputs(bm, id_label, n_ids, channel_last=False):
+    """
+    :param bm: (N, H, W) or (N, H, W, 1) boundary map precomputed by the data iterator
+    :param id_label: (N, H, W) or (N, H, W, 1)
+    :return:
+    """
     # id (index) -> onehot
     _check_intput(id_label)
     if len(id_label.shape) == 3:
         id_label = id_label.reshape(id_label.shape + (1,))
     id_onehot = F.one_hot(id_label, shape=(n_ids,))
 
-    # inst -> boundary map
-    _check_intput(inst_label)
-    bm = inst_to_boundary(inst_label)
+    _check_intput(bm)
     if len(bm.shape) == 3:
         bm = bm.reshape(bm.shape + (1,))
 
-    if use_encoder:
-        # todo: implement encoder network
-        pass
-
     if channel_last:
         return id_onehot, bm
 
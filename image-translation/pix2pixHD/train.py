@@ -52,6 +52,7 @@ def get_config():
     conf.nnabla_context.update(
         {"device_id": args.device_id, "ext_name": args.ext_name, "type_config": args.type_config})
     conf.train.fix_global_epoch = args.fix_global_epoch
+    conf.train.mixed_precision = args.type_config == "half"
     conf.model.d_n_scales = args.d_n_scales
     conf.model.g_n_scales = args.g_n_scales
 
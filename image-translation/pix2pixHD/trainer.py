@@ -22,7 +22,7 @@ import nnabla.functions as F
 from nnabla.logger import logger
 
 from utils import *
-from models import LocalGenerator, encode_inputs
+from models import LocalGenerator, encode_precomputed_inputs
 
 
 class Trainer(object):
@@ -38,30 +38,60 @@ class Trainer(object):
             x * mconf.g_n_scales for x in mconf.base_image_shape)
         self.data_iter = create_cityscapes_iterator(self.bs, data_list,
                                                     image_shape=self.image_shape,
-                                                    rng=rng, flip=tconf.flip)
+                                                    rng=rng, flip=tconf.flip, boundary_map=True)
         if comm.n_procs > 1:
             self.data_iter = self.data_iter.slice(
                 rng, num_of_slices=comm.n_procs, slice_pos=comm.rank)
 
         self.comm = comm
+        # hierarchical all-reduce is used only when processes are running on multiple nodes.
+        self.hierarchical_all_reduce = (tconf.hierarchical_all_reduce and
+                                        comm.setup_hierarchical_groups())
         self.fix_global_epoch = max(tconf.fix_global_epoch, 0)
         self.use_encoder = False  # currently encoder is not supported.
+        self.channel_last = mconf.channel_last
 
         self.load_path = tconf.load_path
 
+    def _transform_batch(self, image, boundary_map, object_id):
+        # data iterator yields channel first images.
+        if self.channel_last:
+            image = np.ascontiguousarray(image.transpose((0, 2, 3, 1)))
+
+        # wrap into NdArray here so that the training loop only copies them into the graph inputs.
+        return tuple(nn.NdArray.from_numpy_array(x) for x in (image, boundary_map, object_id))
+
+    def _get_all_reduce_callback(self, solver):
+        if self.hierarchical_all_reduce:
+            return None
+
+        return self.comm.get_all_reduce_callback(solver.get_parameters().values())
+
+    def _reduce_grads_hierarchically(self, grads):
+        if not self.hierarchical_all_reduce:
+            return
+
+        self.comm.hierarchical_all_reduce(grads)
+
     def train(self):
-        real = nn.Variable(shape=(self.bs, 3) + self.image_shape)
-        inst_label = nn.Variable(shape=(self.bs,) + self.image_shape)
+        if self.channel_last:
+            real = nn.Variable(shape=(self.bs,) + self.image_shape + (3,))
+        else:
+            real = nn.Variable(shape=(self.bs, 3) + self.image_shape)
+        boundary = nn.Variable(shape=(self.bs,) + self.image_shape)
         id_label = nn.Variable(shape=(self.bs,) + self.image_shape)
 
-        id_onehot, bm = encode_inputs(
-            inst_label, id_label, n_ids=self.model_conf.n_label_ids, use_encoder=self.use_encoder)
+        # boundary map is precomputed by the data iterator since it doesn't depend on parameters.
+        id_onehot, bm = encode_precomputed_inputs(boundary, id_label,
+                                                  n_ids=self.model_conf.n_label_ids,
+                                                  channel_last=self.channel_last)
 
-        x = F.concatenate(id_onehot, bm, axis=1)
+        c_axis = -1 if self.channel_last else 1
+        x = F.concatenate(id_onehot, bm, axis=c_axis)
 
         # generator
         # Note that only global generator would be used in the case of g_scales = 1.
-        generator = LocalGenerator()
+        generator = LocalGenerator(channel_last=self.channel_last)
         fake, _, = generator(x,
                              lg_channels=self.model_conf.lg_channels,
                              gg_channels=self.model_conf.gg_channels,
@@ -71,41 +101,72 @@ class Trainer(object):
         unlinked_fake = fake.get_unlinked_variable(need_grad=True)
 
         # discriminator
-        discriminator = PatchGAN(
-            n_scales=self.model_conf.d_n_scales, use_spectral_normalization=False)
-        d_real_out, d_real_feats = discriminator(
-            F.concatenate(real, x, axis=1))
-        d_fake_out, d_fake_feats = discriminator(
-            F.concatenate(unlinked_fake, x, axis=1))
+        discriminator = PatchGAN(n_scales=self.model_conf.d_n_scales,
+                                 use_spectral_normalization=False,
+                                 channel_last=self.channel_last)
+
+        # real and fake are batched so that discriminator runs once per iteration.
+        d_input_real = F.concatenate(real, x, axis=c_axis)
+        d_input_fake = F.concatenate(unlinked_fake, x, axis=c_axis)
+        d_out, d_feats = discriminator(
+            F.concatenate(d_input_real, d_input_fake, axis=0))
+        d_real_out, d_real_feats, d_fake_out, d_fake_feats = discriminator.split_outputs(
+            d_out, d_feats, self.bs)
+
         g_gan, g_feat, d_real, d_fake = discriminator.get_loss(d_real_out, d_real_feats,
                                                                d_fake_out, d_fake_feats,
                                                                use_fm=True,
                                                                fm_lambda=self.train_conf.lambda_feat,
                                                                gan_loss_type="ls")
 
-        g_vgg = vgg16_perceptual_loss(
-            real, unlinked_fake) * self.train_conf.lambda_perceptual
+        g_vgg = vgg16_perceptual_loss(real, unlinked_fake,
+                                      channel_last=self.channel_last) * self.train_conf.lambda_perceptual
 
-        set_persistent_all(bm, fake, fake, g_gan,
-                           g_feat, g_vgg, d_real, d_fake)
+        # Only the variables read after backward are kept.
+        # fake is visualized at the end of each epoch and losses are read by the reporter.
+        set_persistent_all(fake, g_gan, g_feat, g_vgg, d_real, d_fake)
 
         g_loss = g_gan + g_feat + g_vgg
         d_loss = 0.5 * (d_real + d_fake)
 
+        # discriminator outputs are shared by generator and discriminator updates.
+        all_loss = F.sink(g_loss, d_loss)
+
         # load parameters
         if self.load_path:
             if not os.path.exists(self.load_path):
                 logger.warn("Path to load params is not found."
                             " Loading params is skipped. ({})".format(self.load_path))
             else:
-                nn.load_parameters(self.load_path)
+                # checkpoints saved in the other memory layout are converted here.
+                load_parameters_converting_layout(self.load_path)
+
+        # index parameters by the prefixes used by solvers with a single scan.
+        self._param_index = get_params_index(
+            ("generator/local", "generator", "discriminator"))
 
         # Setup Solvers
         g_solver = S.Adam(beta1=0.5)
-        g_solver.set_parameters(get_params_startswith("generator/local"))
+        g_solver.set_parameters(self._param_index["generator/local"])
 
         d_solver = S.Adam(beta1=0.5)
-        d_solver.set_parameters(get_params_startswith("discriminator"))
+        d_solver.set_parameters(self._param_index["discriminator"])
+
+        # Loss scaling for mixed precision training. Solvers keep parameters in float.
+        scaler_opts = dict(scale=self.train_conf.loss_scaling,
+                           scaling_factor=self.train_conf.loss_scaling_factor,
+                           N=self.train_conf.loss_scaling_interval,
+                           enabled=self.train_conf.mixed_precision)
+        g_scaler = DynamicLossScaler(**scaler_opts)
+        d_scaler = DynamicLossScaler(**scaler_opts)
+
+        # All-reduce gradients during backward to overlap communication with computation.
+        g_comm_cb = self._get_all_reduce_callback(g_solver)
+        d_comm_cb = self._get_all_reduce_callback(d_solver)
+
+        # gradient arrays are listed once and rebuilt only when solver parameters are changed.
+        self._g_grads = [x.grad for x in g_solver.get_parameters().values()]
+        self._d_grads = [x.grad for x in d_solver.get_parameters().values()]
 
         # lr scheduler
         lr_schduler = LinearDecayScheduler(self.train_conf.base_lr, 0.,
@@ -119,72 +180,95 @@ class Trainer(object):
 
         # for label2color
         label2color = Colorize(self.model_conf.n_label_ids)
+        id_color = label2color.get_device_colorizer(id_label)
+
+        # for visualization of generated and real images
+        fake_nhwc = get_nhwc_uint8_converter(fake, self.channel_last)
+        real_nhwc = get_nhwc_uint8_converter(real, self.channel_last)
+
+        # load the next batches in background while training.
+        data_iter = PrefetchIterator(
+            self.data_iter, transform=self._transform_batch)
+
+        # snapshots are saved in background so that training resumes immediately.
+        saver = AsyncParameterSaver()
 
         for epoch in range(self.train_conf.max_epochs):
             if epoch == self.fix_global_epoch:
-                g_solver.set_parameters(get_params_startswith(
-                    "generator"), reset=False, retain_state=True)
+                g_solver.set_parameters(self._param_index["generator"],
+                                        reset=False, retain_state=True)
+                g_comm_cb = self._get_all_reduce_callback(g_solver)
+                self._g_grads = [x.grad for x in g_solver.get_parameters().values()]
 
             # update learning rate for current epoch
             lr = lr_schduler(epoch)
             g_solver.set_learning_rate(lr)
             d_solver.set_learning_rate(lr)
 
-            progress_iterator = trange(self.data_iter._size // self.bs,
+            progress_iterator = trange(data_iter._size // self.bs,
                                        desc="[epoch {}]".format(epoch), disable=self.comm.rank > 0)
 
             reporter.start(progress_iterator)
 
             for i in progress_iterator:
-                image, instance_id, object_id = self.data_iter.next()
+                image, boundary_map, object_id = data_iter.next()
 
-                real.d = image
-                inst_label.d = instance_id
-                id_label.d = object_id
+                # boundary map and labels are yielded as uint8 arrays.
+                real.data.copy_from(image)
+                boundary.data.copy_from(boundary_map)
+                id_label.data.copy_from(object_id)
 
                 # create fake
                 fake.forward()
 
-                # update discriminator
-                d_solver.zero_grad()
-                d_loss.forward()
-                d_loss.backward(clear_buffer=True)
-
-                if self.comm.n_procs > 1:
-                    params = [
-                        x.grad for x in d_solver.get_parameters().values()]
-                    self.comm.all_reduce(params, division=False, inplace=False)
-                d_solver.update()
+                # compute all losses by a single forward
+                # Buffers not needed in backward, such as the concatenated discriminator inputs, are released here.
+                all_loss.forward(clear_no_need_grad=True)
 
                 # update generator
+                # Buffers are kept since d_loss.backward() reuses them.
+                # NdArray.zero() only flags the array and filling is deferred until it is used,
+                # so this doesn't launch a separate kernel here.
                 unlinked_fake.grad.zero()
                 g_solver.zero_grad()
-                g_loss.forward()
-                g_loss.backward(clear_buffer=True)
+                g_loss.backward(g_scaler.scale, clear_buffer=False)
 
                 # backward generator
-                fake.backward(grad=None, clear_buffer=True)
+                fake.backward(grad=None, clear_buffer=True,
+                              communicator_callbacks=g_comm_cb)
+                self._reduce_grads_hierarchically(self._g_grads)
+                if g_scaler.unscale_grad(g_solver):
+                    g_solver.update()
 
-                if self.comm.n_procs > 1:
-                    params = [
-                        x.grad for x in g_solver.get_parameters().values()]
-                    self.comm.all_reduce(params, division=False, inplace=False)
-                g_solver.update()
+                # update discriminator
+                # Gradients accumulated by g_loss.backward() are discarded here.
+                d_solver.zero_grad()
+                d_loss.backward(d_scaler.scale, clear_buffer=True,
+                                communicator_callbacks=d_comm_cb)
+                self._reduce_grads_hierarchically(self._d_grads)
+                if d_scaler.unscale_grad(d_solver):
+                    d_solver.update()
 
                 # report iteration progress
                 reporter()
 
             # report epoch progress
-            show_images = {"InputImage": label2color(id_label.data.get_data("r")).astype(np.uint8),
-                           # "InputBoundary": bm.data.get_data("r").transpose((0, 2, 3, 1)),
-                           "GeneratedImage": fake.data.get_data("r").transpose((0, 2, 3, 1)),
-                           "RealImagse": real.data.get_data("r").transpose((0, 2, 3, 1))}
+            for out in (id_color, fake_nhwc, real_nhwc):
+                out.forward(clear_buffer=True)
+            show_images = {"InputImage": id_color.data.get_data("r", dtype=np.uint8),
+                           # "InputBoundary": bm.data.get_data("r"),
+                           "GeneratedImage": fake_nhwc.data.get_data("r", dtype=np.uint8),
+                           "RealImagse": real_nhwc.data.get_data("r", dtype=np.uint8)}
             reporter.step(epoch, show_images)
 
             if (epoch % 10) == 0 and self.comm.rank == 0:
-                nn.save_parameters(os.path.join(
+                saver.save(os.path.join(
                     self.train_conf.save_path, 'param_{:03d}.h5'.format(epoch)))
 
+        saver.close()
+
+        data_iter.close()
+
         if self.comm.rank == 0:
             nn.save_parameters(os.path.join(
                 self.train_conf.save_path, 'param_final.h5'))
@@ -24,13 +24,16 @@ common_utils_path = os.path.abspath(
 sys.path.append(common_utils_path)
 
 from neu.reporter import Reporter
-from neu.post_processing import Colorize
-from neu.variable_utils import set_persistent_all, get_params_startswith
+from neu.post_processing import Colorize, get_nhwc_uint8_converter
+from neu.variable_utils import (set_persistent_all, get_params_startswith, get_params_index,
+                                load_parameters_converting_layout, AsyncParameterSaver)
 from neu.yaml_wrapper import read_yaml, write_yaml
 from neu.misc import init_nnabla, get_current_time, AttrDict
 from neu.losses import get_gan_loss, vgg16_perceptual_loss
 from neu.lr_scheduler import LinearDecayScheduler
+from neu.mixed_precision import DynamicLossScaler
 from neu.layers import PatchGAN
+from neu.datasets import PrefetchIterator
 from neu.datasets.city_scapes import (create_data_iterator as create_cityscapes_iterator,
                                       get_cityscape_datalist,
                                       load_function as cityscapes_load_function)
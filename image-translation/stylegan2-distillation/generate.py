@@ -51,11 +51,13 @@ def get_config():
     return config
 
 
-def get_var(path, image_shape):
+def get_var(path, image_shape, channel_last=False):
     image = Image.open(path).convert("RGB").resize(
         image_shape, resample=Image.BILINEAR)
     image = np.array(image)/255.0
-    image = np.transpose(image.astype(np.float32), (2, 0, 1))
+    image = image.astype(np.float32)
+    if not channel_last:
+        image = np.transpose(image, (2, 0, 1))
     image = np.expand_dims(image, 0)
 
     image = (image - 0.5)/(0.5)
@@ -68,8 +70,12 @@ def generate():
     # batch_size is forced to be 1
     config.train.batch_size = 1
 
-    image_shape = (config.train.batch_size, 3) + \
-        tuple(x * config.model.g_n_scales for x in [512, 512])
+    channel_last = config.model.channel_last
+    spatial_shape = tuple(x * config.model.g_n_scales for x in [512, 512])
+    if channel_last:
+        image_shape = (config.train.batch_size,) + spatial_shape + (3,)
+    else:
+        image_shape = (config.train.batch_size, 3) + spatial_shape
 
     # set context
     comm = init_nnabla(config.nnabla_context)
@@ -79,7 +85,7 @@ def generate():
 
     test_image = nn.Variable(shape=image_shape)
     # define generator
-    generator = LocalGenerator()
+    generator = LocalGenerator(channel_last=channel_last)
     generated_image, _, = generator(test_image,
                                     lg_channels=config.model.lg_channels,
                                     gg_channels=config.model.gg_channels,
@@ -92,7 +98,7 @@ def generate():
         logger.warn("Path to load params is not found."
                     " Loading params is skipped and generated result will be unreasonable. ({})".format(config.load_path))
 
-    nn.load_parameters(config.load_path)
+    load_parameters_converting_layout(config.load_path)
 
     progress_iterator = trange(len(img_path_list) // config.train.batch_size,
                                desc="[Generating Images]", disable=comm.rank > 0)
@@ -103,7 +109,7 @@ def generate():
 
     for i in progress_iterator:
         path = img_path_list[i]
-        test_image_data = get_var(path, image_shape[2:])
+        test_image_data = get_var(path, spatial_shape, channel_last)
         test_image.d = test_image_data
 
         generated_image.forward(clear_buffer=True)
@@ -117,8 +123,10 @@ def generate():
         input_image_path = os.path.join(
             save_path, "input_{}_{}.png".format(comm.rank, i))
 
-        imsave(gen_image_path, generated_image_data[0], channel_first=True)
-        imsave(input_image_path, test_image_data[0], channel_first=True)
+        imsave(gen_image_path, generated_image_data[0],
+               channel_first=not channel_last)
+        imsave(input_image_path, test_image_data[0],
+               channel_first=not channel_last)
 
 
 if __name__ == '__main__':
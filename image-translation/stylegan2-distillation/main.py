@@ -47,6 +47,9 @@ def make_parser():
     parser.add_argument('--device-id', type=int,
                         default=0,
                         help='Device ID of the GPU for training')
+    parser.add_argument('--type-config', type=str,
+                        default='float',
+                        help='Type configuration. Use "half" for mixed precision training')
     parser.add_argument('--face-morph', '--style-mix', action='store_true',
                         default=False,
                         help='Set this flag to train for style mixing data')
@@ -69,15 +72,20 @@ if __name__ == '__main__':
     config = read_yaml(os.path.join('configs', 'gender.yaml'))
     args = parser.parse_args()
     config.nnabla_context.device_id = args.device_id
+    config.nnabla_context.type_config = args.type_config
+    config.train.mixed_precision = args.type_config == "half"
     config.gender_faces.data_dir = args.data_root
     config.train.save_path = args.save_path
+    # parameters are loaded by Trainer after the networks are defined.
+    config.train.load_path = args.load_path
     config.train.batch_size = args.batch_size
     config.model.g_n_scales = args.g_n_scales
     config.model.d_n_scales = args.d_n_scales
 
     # nn.set_auto_forward(True)
 
-    ctx = get_extension_context(config.nnabla_context.ext_name)
+    ctx = get_extension_context(config.nnabla_context.ext_name,
+                                type_config=config.nnabla_context.type_config)
     comm = CommunicatorWrapper(ctx)
     nn.set_default_context(ctx)
 
@@ -91,9 +99,6 @@ if __name__ == '__main__':
         di = get_data_iterator_attribute(
             args.data_root, comm, config.train.batch_size, image_shape)
 
-    if args.load_path:
-        nn.load_parameters(args.load_path)
-
     trainer = Trainer(config.train, config.model, comm,
                       di, face_morph=args.face_morph)
 
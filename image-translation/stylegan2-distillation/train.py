@@ -46,25 +46,55 @@ class Trainer(object):
         self.data_iter = di
 
         self.comm = comm
+        # hierarchical all-reduce is used only when processes are running on multiple nodes.
+        self.hierarchical_all_reduce = (tconf.hierarchical_all_reduce and
+                                        comm.setup_hierarchical_groups())
         self.fix_global_epoch = max(tconf.fix_global_epoch, 0)
         self.use_encoder = False  # currently encoder is not supported.
+        self.channel_last = mconf.channel_last
 
         self.load_path = tconf.load_path
 
         self.face_morph = face_morph
 
+    def _transform_batch(self, image_a, image_b):
+        # data iterators yield channel first images.
+        if self.channel_last:
+            image_a = np.ascontiguousarray(image_a.transpose((0, 2, 3, 1)))
+            image_b = np.ascontiguousarray(image_b.transpose((0, 2, 3, 1)))
+
+        # wrap into NdArray here so that the training loop only copies them into the graph inputs.
+        return nn.NdArray.from_numpy_array(image_a), nn.NdArray.from_numpy_array(image_b)
+
+    def _get_all_reduce_callback(self, solver):
+        if self.hierarchical_all_reduce:
+            return None
+
+        return self.comm.get_all_reduce_callback(solver.get_parameters().values())
+
+    def _reduce_grads_hierarchically(self, grads):
+        if not self.hierarchical_all_reduce:
+            return
+
+        self.comm.hierarchical_all_reduce(grads)
+
     def train(self):
+        ref_channels = 6 if self.face_morph else 3
 
-        if self.face_morph:
-            ref_img = nn.Variable(shape=(self.bs, 6) + self.image_shape)
+        if self.channel_last:
+            ref_img = nn.Variable(
+                shape=(self.bs,) + self.image_shape + (ref_channels,))
+            real = nn.Variable(shape=(self.bs,) + self.image_shape + (3,))
         else:
-            ref_img = nn.Variable(shape=(self.bs, 3) + self.image_shape)
+            ref_img = nn.Variable(
+                shape=(self.bs, ref_channels) + self.image_shape)
+            real = nn.Variable(shape=(self.bs, 3) + self.image_shape)
 
-        real = nn.Variable(shape=(self.bs, 3) + self.image_shape)
+        c_axis = -1 if self.channel_last else 1
 
         # generator
         # Note that only global generator would be used in the case of g_scales = 1.
-        generator = LocalGenerator()
+        generator = LocalGenerator(channel_last=self.channel_last)
         fake, _, = generator(ref_img,
                              lg_channels=self.model_conf.lg_channels,
                              gg_channels=self.model_conf.gg_channels,
@@ -74,42 +104,71 @@ class Trainer(object):
         unlinked_fake = fake.get_unlinked_variable(need_grad=True)
 
         # discriminator
-        discriminator = PatchGAN(
-            n_scales=self.model_conf.d_n_scales, use_spectral_normalization=False)
-
-        d_real_out, d_real_feats = discriminator(
-            F.concatenate(real, ref_img, axis=1))
-        d_fake_out, d_fake_feats = discriminator(
-            F.concatenate(unlinked_fake, ref_img, axis=1))
+        discriminator = PatchGAN(n_scales=self.model_conf.d_n_scales,
+                                 use_spectral_normalization=False,
+                                 channel_last=self.channel_last)
+
+        # real and fake are batched so that discriminator runs once per iteration.
+        d_input_real = F.concatenate(real, ref_img, axis=c_axis)
+        d_input_fake = F.concatenate(unlinked_fake, ref_img, axis=c_axis)
+        d_out, d_feats = discriminator(
+            F.concatenate(d_input_real, d_input_fake, axis=0))
+        d_real_out, d_real_feats, d_fake_out, d_fake_feats = discriminator.split_outputs(
+            d_out, d_feats, self.bs)
 
         g_gan, g_feat, d_real, d_fake = discriminator.get_loss(d_real_out, d_real_feats,
                                                                d_fake_out, d_fake_feats,
                                                                use_fm=True,
                                                                fm_lambda=self.train_conf.lambda_feat,
                                                                gan_loss_type="ls")
-        g_vgg = vgg16_perceptual_loss(
-            real, unlinked_fake) * self.train_conf.lambda_perceptual
+        g_vgg = vgg16_perceptual_loss(real, unlinked_fake,
+                                      channel_last=self.channel_last) * self.train_conf.lambda_perceptual
 
-        set_persistent_all(fake, fake, g_gan,
-                           g_feat, g_vgg, d_real, d_fake)
+        # Only the variables read after backward are kept.
+        # fake is visualized at the end of each epoch and losses are read by the reporter.
+        set_persistent_all(fake, g_gan, g_feat, g_vgg, d_real, d_fake)
 
         g_loss = g_gan + g_feat + g_vgg
         d_loss = 0.5 * (d_real + d_fake)
 
+        # discriminator outputs are shared by generator and discriminator updates.
+        all_loss = F.sink(g_loss, d_loss)
+
         # load parameters
         if self.load_path:
             if not os.path.exists(self.load_path):
                 logger.warn("Path to load params is not found."
                             " Loading params is skipped. ({})".format(self.load_path))
             else:
-                nn.load_parameters(self.load_path)
+                # checkpoints saved in the other memory layout are converted here.
+                load_parameters_converting_layout(self.load_path)
+
+        # index parameters by the prefixes used by solvers with a single scan.
+        self._param_index = get_params_index(
+            ("generator/local", "generator", "discriminator"))
 
         # Setup Solvers
         g_solver = S.Adam(beta1=0.5)
-        g_solver.set_parameters(get_params_startswith("generator/local"))
+        g_solver.set_parameters(self._param_index["generator/local"])
 
         d_solver = S.Adam(beta1=0.5)
-        d_solver.set_parameters(get_params_startswith("discriminator"))
+        d_solver.set_parameters(self._param_index["discriminator"])
+
+        # Loss scaling for mixed precision training. Solvers keep parameters in float.
+        scaler_opts = dict(scale=self.train_conf.loss_scaling,
+                           scaling_factor=self.train_conf.loss_scaling_factor,
+                           N=self.train_conf.loss_scaling_interval,
+                           enabled=self.train_conf.mixed_precision)
+        g_scaler = DynamicLossScaler(**scaler_opts)
+        d_scaler = DynamicLossScaler(**scaler_opts)
+
+        # All-reduce gradients during backward to overlap communication with computation.
+        g_comm_cb = self._get_all_reduce_callback(g_solver)
+        d_comm_cb = self._get_all_reduce_callback(d_solver)
+
+        # gradient arrays are listed once and rebuilt only when solver parameters are changed.
+        self._g_grads = [x.grad for x in g_solver.get_parameters().values()]
+        self._d_grads = [x.grad for x in d_solver.get_parameters().values()]
 
         # lr scheduler
         lr_schduler = LinearDecayScheduler(self.train_conf.base_lr, 0.,
@@ -121,78 +180,98 @@ class Trainer(object):
                   "g_vgg": g_vgg, "d_real": d_real, "d_fake": d_fake}
         reporter = Reporter(self.comm, losses, self.train_conf.save_path)
 
+        # for visualization of generated, real and reference images
+        fake_nhwc = get_nhwc_uint8_converter(fake, self.channel_last)
+        real_nhwc = get_nhwc_uint8_converter(real, self.channel_last)
+        ref_nhwc = get_nhwc_uint8_converter(ref_img, self.channel_last)
+
+        # load the next batches in background while training.
+        data_iter = PrefetchIterator(
+            self.data_iter, transform=self._transform_batch)
+
+        # snapshots are saved in background so that training resumes immediately.
+        saver = AsyncParameterSaver()
+
         for epoch in range(self.train_conf.max_epochs):
             if epoch == self.fix_global_epoch:
-                g_solver.set_parameters(get_params_startswith(
-                    "generator"), reset=False, retain_state=True)
+                g_solver.set_parameters(self._param_index["generator"],
+                                        reset=False, retain_state=True)
+                g_comm_cb = self._get_all_reduce_callback(g_solver)
+                self._g_grads = [x.grad for x in g_solver.get_parameters().values()]
 
             # update learning rate for current epoch
             lr = lr_schduler(epoch)
             g_solver.set_learning_rate(lr)
             d_solver.set_learning_rate(lr)
 
-            progress_iterator = trange(self.data_iter._size // self.bs // self.comm.n_procs,
+            progress_iterator = trange(data_iter._size // self.bs // self.comm.n_procs,
                                        desc="[epoch {}]".format(epoch), disable=self.comm.rank > 0)
 
             reporter.start(progress_iterator)
 
             for i in progress_iterator:
-                image_a, image_b = self.data_iter.next()
+                image_a, image_b = data_iter.next()
 
-                real.d = image_a
-                ref_img.d = image_b
+                real.data.copy_from(image_a)
+                ref_img.data.copy_from(image_b)
 
                 # create fake
                 fake.forward()
 
-                # update discriminator
-                d_solver.zero_grad()
-                d_loss.forward()
-                d_loss.backward(clear_buffer=True)
-
-                if self.comm.n_procs > 1:
-                    params = [
-                        x.grad for x in d_solver.get_parameters().values()]
-                    self.comm.all_reduce(params, division=False, inplace=False)
-                d_solver.update()
+                # compute all losses by a single forward
+                # Buffers not needed in backward, such as the concatenated discriminator inputs, are released here.
+                all_loss.forward(clear_no_need_grad=True)
 
                 # update generator
+                # Buffers are kept since d_loss.backward() reuses them.
+                # NdArray.zero() only flags the array and filling is deferred until it is used,
+                # so this doesn't launch a separate kernel here.
                 unlinked_fake.grad.zero()
                 g_solver.zero_grad()
-                g_loss.forward()
-                g_loss.backward(clear_buffer=True)
+                g_loss.backward(g_scaler.scale, clear_buffer=False)
 
                 # backward generator
-                fake.backward(grad=None, clear_buffer=True)
+                fake.backward(grad=None, clear_buffer=True,
+                              communicator_callbacks=g_comm_cb)
+                self._reduce_grads_hierarchically(self._g_grads)
+                if g_scaler.unscale_grad(g_solver):
+                    g_solver.update()
 
-                if self.comm.n_procs > 1:
-                    params = [
-                        x.grad for x in g_solver.get_parameters().values()]
-                    self.comm.all_reduce(params, division=False, inplace=False)
-                g_solver.update()
+                # update discriminator
+                # Gradients accumulated by g_loss.backward() are discarded here.
+                d_solver.zero_grad()
+                d_loss.backward(d_scaler.scale, clear_buffer=True,
+                                communicator_callbacks=d_comm_cb)
+                self._reduce_grads_hierarchically(self._d_grads)
+                if d_scaler.unscale_grad(d_solver):
+                    d_solver.update()
 
                 # report iteration progress
                 reporter()
 
             # report epoch progress
-            show_images = {"GeneratedImage": fake.data.get_data("r").transpose((0, 2, 3, 1)),
-                           "RealImageStyle": real.data.get_data("r").transpose((0, 2, 3, 1))}
+            for out in (fake_nhwc, real_nhwc, ref_nhwc):
+                out.forward(clear_buffer=True)
+            ref_image = ref_nhwc.data.get_data("r", dtype=np.uint8)
+            show_images = {"GeneratedImage": fake_nhwc.data.get_data("r", dtype=np.uint8),
+                           "RealImageStyle": real_nhwc.data.get_data("r", dtype=np.uint8)}
 
             if self.face_morph:
-                show_images['ReferenceImageContent'] = ref_img.data[:, :3].get_data(
-                    "r").transpose((0, 2, 3, 1))
-                show_images['ReferenceImageStyle'] = ref_img.data[:,
-                                                                  3:].get_data("r").transpose((0, 2, 3, 1))
+                show_images['ReferenceImageContent'] = ref_image[..., :3]
+                show_images['ReferenceImageStyle'] = ref_image[..., 3:]
             else:
-                show_images['RefernceImage'] = ref_img.data.get_data(
-                    "r").transpose((0, 2, 3, 1))
+                show_images['RefernceImage'] = ref_image
 
             reporter.step(epoch, show_images)
 
             if (epoch % 5) == 0 and self.comm.rank == 0:
-                nn.save_parameters(os.path.join(
+                saver.save(os.path.join(
                     self.train_conf.save_path, 'param_{:03d}.h5'.format(epoch)))
 
+        saver.close()
+
+        data_iter.close()
+
         if self.comm.rank == 0:
             nn.save_parameters(os.path.join(
                 self.train_conf.save_path, 'param_final.h5'))
@@ -30,9 +30,10 @@ class Decoder(Module):
 
     def __init__(self, hp):
         self.hp = hp
+        # (1, max_len, dim) is broadcasted over batch when added to inputs
         self.pos_enc = get_positional_encoding(
             hp.max_len_mel, hp.decoder_hidden
-        )
+        ).reshape((1, hp.max_len_mel, hp.decoder_hidden))
         for i in range(hp.decoder_layer):
             setattr(
                 self, f"fft_block_{i}",
@@ -44,6 +45,10 @@ class Decoder(Module):
                     dropout=hp.decoder_dropout
                 )
             )
+        # blocks are listed once to avoid attribute lookups in every call
+        self._fft_blocks = [
+            getattr(self, f"fft_block_{i}") for i in range(hp.decoder_layer)
+        ]
 
     def call(self, x, mask=None):
         r"""Compute mel-spectrogram from emebdding.
@@ -56,17 +61,18 @@ class Decoder(Module):
         Returns:
             nn.Variable: Output variable of shape (B, max_len, dim).
         """
-        hp = self.hp
-        x = x + F.tile(self.pos_enc, (hp.batch_size, 1, 1))
+        x = x + self.pos_enc
 
+        # (B, max_len, 1) -> (B, 1, max_len) by reshape, which doesn't move data
+        mask_t = None
         if mask is not None:
-            mask = F.transpose(mask, (0, 2, 1))
+            mask_t = F.reshape(mask, (mask.shape[0], 1, mask.shape[1]))
 
-        for i in range(hp.decoder_layer):
-            x = getattr(self, f"fft_block_{i}")(x, mask)
+        for block in self._fft_blocks:
+            x = block(x, mask_t)
 
         # remove masked output
         if mask is not None:
-            x = masked_fill(x, F.transpose(mask, (0, 2, 1)))
+            x = masked_fill(x, mask)
 
         return x
@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from dataclasses import dataclass
+
 from neu.tts.hparams import HParams
 
 hparams = HParams(
@@ -63,3 +65,41 @@ hparams = HParams(
     anneal_factor=0.1,                  # factor by which to anneal the learning rate
     anneal_steps=()                     # epoch at which to anneal the learning rate
 )
+
+
+@dataclass(frozen=True)
+class FlowConfig:
+    r"""Architecture constants of WaveGlow, which are fixed once the graph is built."""
+    n_flows: int
+    n_samples_per_group: int
+    n_early_every: int
+    n_early_size: int
+    wn_n_layers: int
+    wn_kernel_size: int
+    wn_n_channels: int
+    wn_dilations: tuple
+
+
+def compile_hparams(hp):
+    r"""Check the flow parameters of `hp` and return them as a frozen FlowConfig.
+
+    Args:
+        hp (HParams): Hyper-parameters.
+
+    Returns:
+        FlowConfig: Architecture constants used to build WN and flows.
+    """
+    assert hp.wn_kernel_size % 2 == 1
+    assert hp.wn_n_channels % 2 == 0
+    assert hp.segment_length % hp.n_samples_per_group == 0
+
+    return FlowConfig(
+        n_flows=int(hp.n_flows),
+        n_samples_per_group=int(hp.n_samples_per_group),
+        n_early_every=int(hp.n_early_every),
+        n_early_size=int(hp.n_early_size),
+        wn_n_layers=int(hp.wn_n_layers),
+        wn_kernel_size=int(hp.wn_kernel_size),
+        wn_n_channels=int(hp.wn_n_channels),
+        wn_dilations=tuple(2 ** i for i in range(hp.wn_n_layers))
+    )
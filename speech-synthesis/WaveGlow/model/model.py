@@ -22,16 +22,15 @@ import nnabla.parametric_functions as PF
 import numpy as np
 
 from neu.tts.module import Module
+from hparams import compile_hparams
 
 from .ops import fused_add_tanh_sigmoid_multiply
 from .ops import invertible_conv
 
 
 class WN(Module):
-    def __init__(self, hparams):
-        self.hparams = hparams
-        assert hparams.wn_kernel_size % 2 == 1
-        assert hparams.wn_n_channels % 2 == 0
+    def __init__(self, cfg):
+        self.cfg = cfg
 
     def call(self, audio, spec):
         r"""Return a variable.
@@ -43,11 +42,11 @@ class WN(Module):
         Returns:
             nn.Variable: An output variable.
         """
-        hp = self.hparams
+        cfg = self.cfg
         in_channels = audio.shape[1]
-        n_channels = hp.wn_n_channels
-        n_layers = hp.wn_n_layers
-        kernel_size = hp.wn_kernel_size
+        n_channels = cfg.wn_n_channels
+        n_layers = cfg.wn_n_layers
+        kernel_size = cfg.wn_kernel_size
 
         with nn.parameter_scope('start'):
             audio = PF.convolution(
@@ -56,10 +55,9 @@ class WN(Module):
                 w_init=NormalInitializer(0.05)
             )
 
-        for i in range(n_layers):
+        for i, dilation in enumerate(cfg.wn_dilations):
 
             with nn.parameter_scope(f'layer_{i}'):
-                dilation = 2 ** i
                 padding = ((kernel_size - 1)*dilation) // 2
 
                 with nn.parameter_scope('fused'):
@@ -113,16 +111,18 @@ class WaveGlow(Module):
 
     def __init__(self, hparams):
         self.hparams = hparams
+        # flow parameters are checked and fixed here since they determine the graph.
+        self.cfg = cfg = compile_hparams(hparams)
         # Module does not support ModuleList yet.
-        for i in range(hparams.n_flows):
-            setattr(self, f'WN_{i}', WN(hparams))
-
-        n_half = hparams.n_samples_per_group // 2
-        n_remaining_channels = hparams.n_samples_per_group
-        for k in range(hparams.n_flows):
-            if k % hparams.n_early_every == 0 and k > 0:
-                n_half = n_half - hparams.n_early_size // 2
-                n_remaining_channels = n_remaining_channels - hparams.n_early_size
+        for i in range(cfg.n_flows):
+            setattr(self, f'WN_{i}', WN(cfg))
+
+        n_half = cfg.n_samples_per_group // 2
+        n_remaining_channels = cfg.n_samples_per_group
+        for k in range(cfg.n_flows):
+            if k % cfg.n_early_every == 0 and k > 0:
+                n_half = n_half - cfg.n_early_size // 2
+                n_remaining_channels = n_remaining_channels - cfg.n_early_size
         self.n_remaining_channels = n_remaining_channels
 
         mel_basis = librosa_mel_fn(hparams.sr, hparams.n_fft, n_mels=hparams.n_mels,
@@ -142,7 +142,7 @@ class WaveGlow(Module):
         return mels
 
     def call(self, wave):
-        hp = self.hparams
+        hp, cfg = self.hparams, self.cfg
         batch_size = hp.batch_size
 
         # compute mel-spectrogram from waveform
@@ -161,22 +161,22 @@ class WaveGlow(Module):
 
             # transforming to correct shape
             mels = F.reshape(
-                mels, mels.shape[:2] + (-1, hp.n_samples_per_group))
+                mels, mels.shape[:2] + (-1, cfg.n_samples_per_group))
             mels = F.transpose(mels, (0, 2, 1, 3))
             mels = F.reshape(mels, mels.shape[:2] + (-1,))
             # (B, n_mels * n_groups, L/n_groups)
             mels = F.transpose(mels, (0, 2, 1))
 
         # reshape audio
-        wave = F.reshape(wave, (batch_size, -1, hp.n_samples_per_group))
+        wave = F.reshape(wave, (batch_size, -1, cfg.n_samples_per_group))
         wave = F.transpose(wave, (0, 2, 1))  # (B, n_groups, L/n_groups)
 
         output_audio, log_s_list, log_det_W_list = [], [], []
 
-        for k in range(hp.n_flows):
-            if k % hp.n_early_every == 0 and k > 0:
-                output_audio.append(wave[:, :hp.n_early_size, :])
-                wave = wave[:, hp.n_early_size:, :]
+        for k in range(cfg.n_flows):
+            if k % cfg.n_early_every == 0 and k > 0:
+                output_audio.append(wave[:, :cfg.n_early_size, :])
+                wave = wave[:, cfg.n_early_size:, :]
 
             # apply invertible convolution
             wave, log_det_W = invertible_conv(
@@ -213,7 +213,7 @@ class WaveGlow(Module):
             nn.Variable: A synthetic audio.
         """
 
-        hp = self.hparams
+        hp, cfg = self.hparams, self.cfg
         with nn.parameter_scope('', self.parameter_scope):
 
             #  Upsample spectrogram to size of audio
@@ -226,7 +226,7 @@ class WaveGlow(Module):
 
                 # transforming to correct shape
                 mels = F.reshape(
-                    mels, mels.shape[:2]+(-1, hp.n_samples_per_group))
+                    mels, mels.shape[:2]+(-1, cfg.n_samples_per_group))
                 mels = F.transpose(mels, (0, 2, 1, 3))
                 mels = F.reshape(mels, mels.shape[:2] + (-1,))
                 # (B, n_mels * n_groups, L/n_groups)
@@ -235,7 +235,7 @@ class WaveGlow(Module):
             wave = F.randn(
                 shape=(mels.shape[0], self.n_remaining_channels, mels.shape[2])) * sigma
 
-            for k in reversed(range(hp.n_flows)):
+            for k in reversed(range(cfg.n_flows)):
                 n_half = wave.shape[1] // 2
                 audio_0 = wave[:, :n_half, :]
                 audio_1 = wave[:, n_half:, :]
@@ -250,9 +250,9 @@ class WaveGlow(Module):
                 wave = invertible_conv(
                     wave, reverse=True, rng=self.rng, scope=f'inv_{k}')
 
-                if k % hp.n_early_every == 0 and k > 0:
+                if k % cfg.n_early_every == 0 and k > 0:
                     z = F.randn(
-                        shape=(mels.shape[0], hp.n_early_size, mels.shape[2]))
+                        shape=(mels.shape[0], cfg.n_early_size, mels.shape[2]))
                     wave = F.concatenate(sigma * z, wave, axis=1)
 
             wave = F.transpose(wave, (0, 2, 1))
@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import numpy as np
 import nnabla as nn
 
 from nnabla.logger import logger
@@ -94,3 +95,60 @@ class CommunicatorWrapper(object):
             params = nn.get_parameters().values()
 
         return self.comm.all_reduce_callback([x.grad for x in params], packing_size)
+
+    def setup_hierarchical_groups(self):
+        """
+        Create an intra-node group for each node and an inter-node group of node leaders (local_rank == 0)
+        used by hierarchical_all_reduce. Ranks on the same node are assumed to be contiguous.
+        Returns True if the groups are created, that is, processes are running on multiple nodes.
+        """
+        if self.n_procs == 1:
+            return False
+
+        # gather local ranks of all processes.
+        local_ranks = nn.NdArray.from_numpy_array(
+            np.zeros((self.n_procs, ), dtype=np.float32))
+        local_ranks.data[self.rank] = self.local_rank
+        self.comm.all_reduce([local_ranks], division=False, inplace=True)
+        local_ranks = local_ranks.data.astype(int)
+
+        leaders = [r for r in range(self.n_procs) if local_ranks[r] == 0]
+        if len(leaders) == 1:
+            # single node. a plain all-reduce is used instead.
+            return False
+
+        bounds = leaders + [self.n_procs]
+
+        for node_id in range(len(leaders)):
+            ranks = list(range(bounds[node_id], bounds[node_id + 1]))
+            name = "intra_node_{}".format(node_id)
+            self.comm.new_group((name, ranks))
+
+            if self.rank in ranks:
+                self.intra_node_group = name
+                self.is_node_leader = self.rank == ranks[0]
+
+        self.comm.new_group(("inter_node", leaders))
+
+        return True
+
+    def hierarchical_all_reduce(self, params, inplace=True):
+        """
+        Sum params over all processes by intra-node reduce, inter-node all-reduce among node leaders
+        and intra-node broadcast, so that only node leaders communicate across nodes.
+        setup_hierarchical_groups() must be called in advance.
+        """
+        if self.n_procs == 1:
+            # skip all reduce since no processes have to be all-reduced
+            return
+
+        # node leader is the first rank of each intra-node group, that is, 0 as a group-local rank.
+        self.comm.reduce(params, dst=0, division=False,
+                         inplace=inplace, group=self.intra_node_group)
+
+        if self.is_node_leader:
+            self.comm.all_reduce(params, division=False,
+                                 inplace=inplace, group="inter_node")
+
+        self.comm.bcast(params, src=0,
+                        inplace=inplace, group=self.intra_node_group)
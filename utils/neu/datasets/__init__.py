@@ -15,6 +15,9 @@
 
 from __future__ import absolute_import
 
+import queue
+import threading
+
 from nnabla.utils.data_source import SlicedDataSource
 
 
@@ -40,3 +43,84 @@ def _get_sliced_data_source(ds, comm, shuffle=True):
                               slice_start=start, slice_end=end)
 
     return ds
+
+
+class PrefetchIterator(object):
+    """
+    Wraps a data iterator so that the next batches are loaded in a background thread
+    while the current batch is being computed.
+
+    Args:
+        data_iterator: Data iterator which has `next()`.
+        n_prefetch (int): Number of batches prepared in advance.
+        transform (callable): Function applied to each batch in the background thread,
+            taking the arrays of a batch as arguments and returning them as a tuple.
+
+    usage:
+        di = PrefetchIterator(data_iterator(ds, batch_size), n_prefetch=2)
+        image, label = di.next()
+        ...
+        di.close()
+
+    An error raised while loading is re-raised at every following next().
+    Any other attribute is looked up in the wrapped data iterator.
+    """
+
+    def __init__(self, data_iterator, n_prefetch=2, transform=None):
+        self._di = data_iterator
+        self._transform = transform
+        self._queue = queue.Queue(maxsize=n_prefetch)
+        self._error = None
+        self._stop = threading.Event()
+
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        # wait for a free slot while checking if the iterator is closed.
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                batch = self._di.next()
+                if self._transform is not None:
+                    batch = self._transform(*batch)
+            except Exception as e:
+                # raised in the main thread at next().
+                self._put(e)
+                return
+
+            self._put(batch)
+
+    def next(self):
+        if self._error is not None:
+            raise self._error
+
+        if self._stop.is_set():
+            raise RuntimeError("PrefetchIterator is already closed.")
+
+        batch = self._queue.get()
+        if isinstance(batch, Exception):
+            self._error = batch
+            raise batch
+
+        return batch
+
+    def close(self):
+        """
+        Stop the background thread. Batches loaded in advance are discarded.
+        """
+        self._stop.set()
+        self._thread.join()
+
+    def __getattr__(self, name):
+        if name == "_di":
+            raise AttributeError(name)
+
+        return getattr(self._di, name)
@@ -111,16 +111,42 @@ def load_function(image_path, inst_path, label_path, image_shape):
     return image, inst_map, label_map
 
 
+def inst_to_boundary(inst_map):
+    """
+    Compute a boundary map from an instance map on host.
+    A pixel is on a boundary if any of its 4-neighbors (zero padded) belongs to another instance.
+
+    :param inst_map: (H, W)
+    :return: (H, W) uint8
+    """
+    pad = np.pad(inst_map, 1, mode="constant")
+    center = pad[1:-1, 1:-1]
+
+    bm = center != pad[:-2, 1:-1]
+    bm |= center != pad[2:, 1:-1]
+    bm |= center != pad[1:-1, :-2]
+    bm |= center != pad[1:-1, 2:]
+
+    return bm.astype(np.uint8)
+
+
 class CityScapesIterator(DataSource):
-    def __init__(self, data_list, image_shape=(1024, 2048), shuffle=True, rng=None, flip=True):
+    def __init__(self, data_list, image_shape=(1024, 2048), shuffle=True, rng=None, flip=True,
+                 boundary_map=False):
         super(CityScapesIterator, self).__init__(shuffle=shuffle, rng=rng)
 
         self._data_list = data_list  # [[image, inst, label], ...]
         self._image_shape = image_shape
         self._size = len(self._data_list)
-        self._variables = ("image", "instance_id", "label_id")
         self.flip = flip
 
+        # If True, a uint8 boundary map is computed from the instance map and returned instead of it.
+        self.boundary_map = boundary_map
+        if boundary_map:
+            self._variables = ("image", "boundary_map", "label_id")
+        else:
+            self._variables = ("image", "instance_id", "label_id")
+
         self.reset()
 
     def reset(self):
@@ -147,13 +173,18 @@ class CityScapesIterator(DataSource):
                 inst_map = inst_map[..., ::-1]
                 label_map = label_map[..., ::-1]
 
+        if self.boundary_map:
+            # boundary map is invariant to flip, so it can be computed after flip.
+            return image, inst_to_boundary(inst_map), label_map.astype(np.uint8)
+
         return image, inst_map, label_map
 
 
 def create_data_iterator(batch_size, data_list, image_shape, comm=None, shuffle=True, rng=None,
-                         with_memory_cache=False, with_parallel=False, with_file_cache=False, flip=True):
+                         with_memory_cache=False, with_parallel=False, with_file_cache=False, flip=True,
+                         boundary_map=False):
     ds = CityScapesIterator(data_list, image_shape,
-                            shuffle=shuffle, rng=rng, flip=flip)
+                            shuffle=shuffle, rng=rng, flip=flip, boundary_map=boundary_map)
 
     ds = _get_sliced_data_source(ds, comm, shuffle=shuffle)
 
@@ -97,7 +97,7 @@ def rescale_values(x, input_min=-1, input_max=1, output_min=0, output_max=255):
 
 class PatchGAN(object):
     def __init__(self, n_layers=4, base_ndf=64, n_scales=2,
-                 use_sigmoid=False, use_spectral_normalization=True):
+                 use_sigmoid=False, use_spectral_normalization=True, channel_last=False):
         """
         PatchGAN discriminator.
 
@@ -106,19 +106,23 @@ class PatchGAN(object):
         :param base_ndf:
         :param n_scales:
         :param use_sigmoid:
+        :param channel_last: If True, inputs are handled as (N, H, W, C).
         """
 
         self.n_layers = n_layers
         self.base_ndf = base_ndf
         self.n_scales = n_scales
         self.use_sigmoid = use_sigmoid
+        self.channel_last = channel_last
 
-        self.conv_opts = dict(w_init=I.NormalInitializer(0.02))
+        self.conv_opts = dict(w_init=I.NormalInitializer(0.02),
+                              channel_last=channel_last)
         if use_spectral_normalization:
             self.conv_opts["apply_w"] = spectral_norm_callback(dim=0)
 
     def instance_norm_lrelu(self, x, alpha=0.2):
-        norm = PF.instance_normalization(x, no_scale=True, no_bias=True)
+        norm = PF.instance_normalization(x, no_scale=True, no_bias=True,
+                                         channel_axis=3 if self.channel_last else 1)
         return F.leaky_relu(norm, alpha=alpha)
 
     def pad_conv(self, x, fdim, stride):
@@ -184,6 +188,35 @@ class PatchGAN(object):
 
         return g_gan, g_feat, d_real, d_fake
 
+    @staticmethod
+    def split_outputs(outs, feats, batch_size):
+        """
+        Split PatchGAN outputs for a batch of real and fake inputs concatenated along the batch axis.
+
+        Args:
+            outs, feats (dict): Outputs returned from PatchGAN.__call__() whose input is `F.concatenate(real, fake, axis=0)`.
+            batch_size (int): Batch size of real (and fake) input.
+
+        usage:
+            d = PatchGAN(n_layers=4, n_scales=2)
+            outs, feats = d(F.concatenate(real, fake, axis=0))
+            real_out, real_feats, fake_out, fake_feats = d.split_outputs(outs, feats, real.shape[0])
+
+        """
+
+        real_out = {k: v[:batch_size] for k, v in outs.items()}
+        fake_out = {k: v[batch_size:] for k, v in outs.items()}
+
+        real_feats = {}
+        fake_feats = {}
+        for disc_id, layer_feats in feats.items():
+            real_feats[disc_id] = {k: v[:batch_size]
+                                   for k, v in layer_feats.items()}
+            fake_feats[disc_id] = {k: v[batch_size:]
+                                   for k, v in layer_feats.items()}
+
+        return real_out, real_feats, fake_out, fake_feats
+
     def __call__(self, x):
         outs = {}
         feats = {}
@@ -191,8 +224,8 @@ class PatchGAN(object):
             # Create all scale inputs first.
             inputs = [x]
             for i in range(self.n_scales - 1):
-                inputs.append(F.average_pooling(
-                    inputs[-1], (3, 3), (2, 2), pad=(1, 1), including_pad=False))
+                inputs.append(F.average_pooling(inputs[-1], (3, 3), (2, 2), pad=(1, 1),
+                                                including_pad=False, channel_last=self.channel_last))
 
             for i in range(self.n_scales):
                 # Get input in reverse order of its scale (from coarse to fine) to preserve discriminator indexes.
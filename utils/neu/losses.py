@@ -206,10 +206,12 @@ def get_gan_loss(type):
     return gan_loss
 
 
-def vgg16_perceptual_loss(fake, real):
+def vgg16_perceptual_loss(fake, real, channel_last=False):
     '''VGG perceptual loss based on VGG-16 network.
 
     Assuming the values in fake and real are in [0, 255].
+    If channel_last is True, inputs are (N, H, W, C) and transposed to
+    (N, C, H, W) since VGG16 in nnabla.models only accepts channel first.
 
     Features are obtained from all ReLU activations of the first convolution
     after each downsampling (maxpooling) layer
@@ -244,6 +246,10 @@ def vgg16_perceptual_loss(fake, real):
         o.visit(f)
         return f
 
+    if channel_last:
+        fake = F.transpose(fake, (0, 3, 1, 2))
+        real = F.transpose(real, (0, 3, 1, 2))
+
     with nn.parameter_scope("vgg16_loss"):
         fake_features = get_features(fake)
         real_features = get_features(real)
@@ -0,0 +1,62 @@
+# Copyright 2021 Sony Group Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+class DynamicLossScaler(object):
+    """
+    Dynamic loss scaling for mixed precision training.
+
+    The loss scale is divided by `scaling_factor` when inf or nan is found in gradients
+    (and the update is skipped), and multiplied by `scaling_factor` after `N` successful updates.
+    If `enabled` is False, the scale is fixed to 1 and all updates are performed.
+
+    usage:
+        scaler = DynamicLossScaler(scale=8., enabled=type_config == "half")
+
+        solver.zero_grad()
+        loss.backward(scaler.scale, clear_buffer=True)
+        if scaler.unscale_grad(solver):
+            solver.update()
+
+    """
+
+    def __init__(self, scale=8., scaling_factor=2., N=2000, enabled=True):
+        self.scale = scale if enabled else 1.
+        self.scaling_factor = scaling_factor
+        self.N = N
+        self.enabled = enabled
+
+        self._counter = 0
+
+    def unscale_grad(self, solver):
+        """
+        Check gradients of `solver` and unscale them.
+        Returns False if inf or nan is found and the update should be skipped.
+        """
+        if not self.enabled:
+            return True
+
+        if solver.check_inf_or_nan_grad():
+            self.scale /= self.scaling_factor
+            self._counter = 0
+            return False
+
+        solver.scale_grad(1. / self.scale)
+
+        self._counter += 1
+        if self._counter > self.N:
+            self.scale *= self.scaling_factor
+            self._counter = 0
+
+        return True
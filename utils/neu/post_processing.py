@@ -86,3 +86,54 @@ class Colorize(object):
             color_image = color_image.transpose((0, 3, 1, 2))
 
         return color_image
+
+    def get_device_colorizer(self, label):
+        """
+        Build a graph colorizing label ids on the device as a lookup of the color map.
+
+        Args:
+            label (nn.Variable): Label ids of shape (N, H, W).
+
+        Returns:
+            nn.Variable: Color image of shape (N, H, W, 3) in [0, 255]. Call forward() to update it.
+        """
+        import nnabla as nn
+        import nnabla.functions as F
+
+        cmap = nn.Variable.from_numpy_array(
+            self.cmap.astype(np.float32), need_grad=False)
+
+        # unlinked so that forward doesn't go through the network creating `label`.
+        h = label.get_unlinked_variable(need_grad=False)
+
+        return F.embed(h, cmap)
+
+
+def get_nhwc_uint8_converter(var, channel_last=False, input_min=-1., input_max=1.):
+    """
+    Build a graph converting an image variable in [input_min, input_max] into (N, H, W, C) in [0, 255].
+
+    Transpose, rescaling and rounding are done on the device, so that the result can be fetched to host
+    by a single contiguous copy with `out.data.get_data("r", dtype=np.uint8)` after `out.forward()`.
+
+    Args:
+        var (nn.Variable): Images whose shape is (N, C, H, W) or (N, H, W, C) depending on `channel_last`.
+        channel_last (bool): If True, `var` is handled as (N, H, W, C) and transpose is skipped.
+        input_min, input_max (float): Value range of `var`.
+
+    Returns:
+        nn.Variable: Converted images of shape (N, H, W, C). Call forward() to update it.
+    """
+    import nnabla as nn
+    import nnabla.functions as F
+
+    assert isinstance(var, nn.Variable)
+    assert input_max > input_min
+
+    # unlinked so that forward doesn't go through the network creating `var`.
+    h = var.get_unlinked_variable(need_grad=False)
+    if not channel_last:
+        h = F.transpose(h, (0, 2, 3, 1))
+    h = (h - input_min) * (255. / (input_max - input_min))
+
+    return F.round(F.minimum_scalar(F.maximum_scalar(h, 0.), 255.))
@@ -210,7 +210,9 @@ class Reporter(object):
 
         save_path = os.path.join(dir_path, file_name)
 
-        img = (img - img.min()) / (img.max() - img.min())
+        # uint8 images are already in [0, 255] and saved as they are.
+        if img.dtype != np.uint8:
+            img = (img - img.min()) / (img.max() - img.min())
         imsave(save_path, img)
 
     def _render_html(self, epoch, image_names):
@@ -13,6 +13,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 import nnabla as nn
 
 
@@ -20,6 +23,19 @@ def get_params_startswith(str):
     return {k: v for k, v in nn.get_parameters().items() if k.startswith(str)}
 
 
+def get_params_index(prefixes):
+    """
+    Returns {prefix: {name: param, ...}, ...} for each prefix by a single scan over all parameters.
+    """
+    index = {prefix: {} for prefix in prefixes}
+    for k, v in nn.get_parameters().items():
+        for prefix in prefixes:
+            if k.startswith(prefix):
+                index[prefix][k] = v
+
+    return index
+
+
 def set_persistent_all(*variables):
     for var in variables:
         if var is None:
@@ -79,3 +95,103 @@ def fill_all(*variables, value=0):
             raise ValueError("all variables must be nn.Variable")
 
         var.data.fill(value)
+
+
+def _fit_weight_layout(array, shape):
+    # transpose a 4D weight between (O, I, kh, kw) and (O, kh, kw, I) only if it fits `shape` by that.
+    if array.ndim != 4 or array.shape == shape:
+        return array
+
+    for axes in [(0, 2, 3, 1), (0, 3, 1, 2)]:
+        if tuple(array.shape[i] for i in axes) == shape:
+            return array.transpose(axes)
+
+    return array
+
+
+def load_parameters_converting_layout(path):
+    """
+    Load parameters from `path` into the parameters already created by the network,
+    converting 4D weights between channel first and channel last layouts.
+
+    Convolution weights are (O, I, kh, kw) in channel first and (O, kh, kw, I) in channel last.
+    Each loaded 4D weight is transposed only if its shape differs from the existing one
+    and matches it after transpose, so that weights kept in channel first regardless of the layout
+    (e.g. vgg16_loss/*) are copied as they are. Note that a weight with I == kh == kw has the same shape
+    in both layouts and is always copied as it is.
+    Parameters which don't exist yet are registered as they are.
+    """
+    with nn.parameter_scope('', OrderedDict()):
+        nn.load_parameters(path)
+        loaded = nn.get_parameters(grad_only=False)
+
+    params = nn.get_parameters(grad_only=False)
+
+    for key, param in loaded.items():
+        if key not in params:
+            nn.parameter.set_parameter(key, param)
+            continue
+
+        array = _fit_weight_layout(param.d, params[key].shape)
+
+        if array.shape != params[key].shape:
+            raise ValueError("Shape of {} mismatches. loaded: {}, expected: {}".format(
+                key, array.shape, params[key].shape))
+
+        params[key].d = array
+
+
+def get_params_snapshot():
+    """
+    Returns {name: param, ...} holding host copies of all parameters,
+    which can be saved by nn.save_parameters(path, params) while training updates the originals.
+    """
+    return OrderedDict((k, nn.Variable.from_numpy_array(v.d.copy(), need_grad=v.need_grad))
+                       for k, v in nn.get_parameters(grad_only=False).items())
+
+
+class AsyncParameterSaver(object):
+    """
+    Save snapshots of parameters in a background thread so that training resumes immediately.
+
+    usage:
+        saver = AsyncParameterSaver()
+        for epoch in range(max_epochs):
+            ...
+            saver.save("param_{:03d}.h5".format(epoch))
+
+        saver.close()
+
+    An error of a save is raised at the next save(), wait() or close().
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._future = None
+
+    def save(self, path):
+        """
+        Copy all parameters to host and save them to `path` in background.
+        """
+        self.wait()
+        self._future = self._executor.submit(
+            nn.save_parameters, path, get_params_snapshot())
+
+    def wait(self):
+        """
+        Wait for the save in progress.
+        """
+        if self._future is None:
+            return
+
+        future, self._future = self._future, None
+        future.result()
+
+    def close(self):
+        """
+        Wait for the save in progress and stop the background thread.
+        """
+        try:
+            self.wait()
+        finally:
+            self._executor.shutdown(wait=True)